@@ -26,6 +26,9 @@ import inspect
 Pattern = Dict[str, Any]
 Action = Callable[[Any], Optional[Any]]  # action(node) -> replacement or None
 
+# Marks an attribute the node does not have (None can be a legitimate value)
+_MISSING = object()
+
 
 class PatternRule:
     def __init__(self, name: str, pattern: Pattern, action: Optional[Action] = None, description: str = ""):
@@ -49,12 +52,14 @@ class PatternRule:
         if t:
             if type(node).__name__ != t:
                 return False
-        # Match attributes
-        attrs = self.pattern.get("attrs", {})
+        # Match attributes (no default dict: this runs for every node x rule pair)
+        attrs = self.pattern.get("attrs")
+        if not attrs:
+            return True
         for k, expected in attrs.items():
-            if not hasattr(node, k):
+            val = getattr(node, k, _MISSING)
+            if val is _MISSING:
                 return False
-            val = getattr(node, k)
             if callable(expected):
                 try:
                     if not expected(val):
@@ -128,15 +133,28 @@ class PatternEngine:
         """
         Yields tuples (parent, attr_name, child_node) for nodes found in the AST.
         For top-level nodes in Program.body, parent is the Program instance and attr_name is 'body'.
+
+        Pre-order, driven by an explicit stack of child iterators so deep trees neither
+        hit the recursion limit nor pay a `yield from` hop per level for every node.
         """
+        stack = [self._iter_children(node)]
+        while stack:
+            for entry in stack[-1]:
+                yield entry
+                # descend into the child before continuing with its siblings
+                stack.append(self._iter_children(entry[2]))
+                break
+            else:
+                stack.pop()
+
+    def _iter_children(self, node: Any):
+        """Yield (node, attr_info, child) for the direct children of `node`."""
         if node is None:
             return
         # If this is a Program with a `body` attribute (list)
         if hasattr(node, "body") and isinstance(node.body, list):
             for idx, child in enumerate(node.body):
                 yield (node, ("body", idx), child)
-                # Recurse into child
-                yield from self._walk_with_parents(child)
             return
         # If node has attributes that are lists or nested nodes, attempt to traverse common shapes
         for name, value in inspect.getmembers(node, lambda v: not(inspect.isroutine(v))):
@@ -148,10 +166,8 @@ class PatternEngine:
                 for idx, item in enumerate(value):
                     if self._is_ast_node(item):
                         yield (node, (name, idx), item)
-                        yield from self._walk_with_parents(item)
             elif self._is_ast_node(value):
                 yield (node, (name, None), value)
-                yield from self._walk_with_parents(value)
 
     @staticmethod
     def _is_ast_node(obj: Any) -> bool:
@@ -43,8 +43,9 @@ class Codegen:
         """
         Return (and create if needed) a global constant holding `text\0`.
         """
-        if text in self._str_constants:
-            return self._str_constants[text]
+        gv = self._str_constants.get(text)
+        if gv is not None:
+            return gv
         data = text.encode("utf8") + b"\x00"
         arr_ty = ir.ArrayType(ir.IntType(8), len(data))
         # initializer expects a bytes-like or list of ints
@@ -76,8 +77,9 @@ class Codegen:
         """
         name = _sanitize_name(getattr(capsule, "name", "capsule"))
         func_name = f"capsule_{name}"
-        if func_name in self._capsule_funcs:
-            return self._capsule_funcs[func_name]
+        func = self._capsule_funcs.get(func_name)
+        if func is not None:
+            return func
 
         func_ty = ir.FunctionType(ir.VoidType(), [])
         func = ir.Function(self.module, func_ty, name=func_name)
@@ -131,23 +133,10 @@ class Codegen:
         # Emit all capsule functions first
         calls = []
         for node in getattr(program, "body", []):
-            tname = type(node).__name__
-            if tname == "Capsule":
-                fn = self.emit_capsule(node)
+            emit = _TOP_LEVEL_EMITTERS.get(type(node).__name__, Codegen._emit_unknown)
+            fn = emit(self, node)
+            if fn is not None:
                 calls.append(fn)
-            elif tname == "Main" or tname == "MainBlock":
-                # create an empty helper function for MainBlock for symmetry
-                mainblk_name = "main_block"
-                if mainblk_name not in self._capsule_funcs:
-                    fb = ir.Function(self.module, ir.FunctionType(ir.VoidType(), []), name=mainblk_name)
-                    b = fb.append_basic_block("entry")
-                    ir.IRBuilder(b).ret_void()
-                    self._capsule_funcs[mainblk_name] = fb
-                calls.append(self._capsule_funcs[mainblk_name])
-            else:
-                # unknown top-level node: attempt to emit if it has a `name` attr and body
-                if hasattr(node, "name") and hasattr(node, "body"):
-                    calls.append(self.emit_capsule(node))
 
         # Call each capsule/function in order
         for fn in calls:
@@ -158,6 +147,22 @@ class Codegen:
         self.builder = None
         return main_fn
 
+    def _emit_main_block(self, node: Any) -> ir.Function:
+        # create an empty helper function for MainBlock for symmetry
+        mainblk_name = "main_block"
+        if mainblk_name not in self._capsule_funcs:
+            fb = ir.Function(self.module, ir.FunctionType(ir.VoidType(), []), name=mainblk_name)
+            b = fb.append_basic_block("entry")
+            ir.IRBuilder(b).ret_void()
+            self._capsule_funcs[mainblk_name] = fb
+        return self._capsule_funcs[mainblk_name]
+
+    def _emit_unknown(self, node: Any):
+        # unknown top-level node: attempt to emit if it has a `name` attr and body
+        if hasattr(node, "name") and hasattr(node, "body"):
+            return self.emit_capsule(node)
+        return None
+
     def generate(self, program: Any):
         """
         Top-level entry: generate module contents for a Program AST node.
@@ -179,3 +184,10 @@ class Codegen:
             f.write(str(self.module))
             print(f"LLVM IR written to {path}")
 
+
+# Top-level node type name -> emitter, dispatched once per node in Codegen.emit_main
+_TOP_LEVEL_EMITTERS = {
+    "Capsule": Codegen.emit_capsule,
+    "Main": Codegen._emit_main_block,
+    "MainBlock": Codegen._emit_main_block,
+}
@@ -5,17 +5,26 @@ Tokenizer for Trion language.
 
 Produces a list of (type, value) tuples suitable for the simple parser.
 Ignores whitespace, comments and newlines. Keywords are matched before identifiers.
+
+For large inputs `tokenize_stream` returns a `TokenStream`: token kinds, spans and
+positions are kept in parallel arrays and values are sliced from the source on demand.
 """
 
 import re
-from typing import List, Tuple
+from array import array
+from typing import Iterator, List, Tuple
+
+KEYWORDS: Tuple[str, ...] = (
+    "Main", "Capsule", "If", "Then", "Else", "Elseif", "While", "For", "EndCapsule",
+    "Print", "Isolate", "Try", "Execute", "Fail", "True", "False",
+)
 
 # Ordered token specs: order matters (KEYWORD before IDENT)
 TOKEN_SPECS = [
     ("SKIP",     r"[ \t\r]+"),                             # spaces and tabs
     ("COMMENT",  r"--[^\n]*"),                             # -- comment to end of line
     ("NEWLINE",  r"\n"),                                   # newline
-    ("KEYWORD",  r"\b(?:Main|Capsule|If|Then|Else|Elseif|While|For|EndCapsule|Print|Isolate|Try|Execute|Fail|True|False)\b"),
+    ("KEYWORD",  r"\b(?:" + "|".join(KEYWORDS) + r")\b"),
     ("IDENT",    r"[A-Za-z_][A-Za-z0-9_]*"),               # identifiers
     ("NUMBER",   r"\b\d+\b"),                              # integers
     ("STRING",   r'"(?:\\.|[^"\\])*"'),                    # double-quoted strings with escapes
@@ -26,35 +35,232 @@ TOKEN_SPECS = [
 # Precompile regexes for performance
 _TOKEN_REGEXES = [(typ, re.compile(pattern)) for typ, pattern in TOKEN_SPECS]
 
+# Token kind names indexed by the small integer codes stored in TokenStream.kinds
+TOKEN_KINDS: Tuple[str, ...] = tuple(typ for typ, _ in TOKEN_SPECS)
+_KIND_CODE = {typ: i for i, typ in enumerate(TOKEN_KINDS)}
+_MISMATCH = _KIND_CODE["MISMATCH"]
+_OP = _KIND_CODE["OP"]
+_STRING = _KIND_CODE["STRING"]
+_KEYWORD = _KIND_CODE["KEYWORD"]
+_IDENT = _KIND_CODE["IDENT"]
+_SKIP_RE = dict(_TOKEN_REGEXES)["SKIP"]
+_IDENT_RE = dict(_TOKEN_REGEXES)["IDENT"]
+
+# Words starting with an ASCII letter are matched once as IDENT and promoted to KEYWORD
+# by set lookup. _WORD_CHAR_RE reproduces the keyword regex's \b checks on either side.
+_KEYWORD_SET = frozenset(KEYWORDS)
+_WORD_CHAR_RE = re.compile(r"\w")
+
+# Single-character operators; emitted by tokenize_stream without a regex match
+_OP_CHARS = frozenset("+-*/<>=,:")
+
+# Keyword and operator tokens have a fixed set of values, so their (type, value) tuples
+# are built once here and shared by every occurrence instead of allocated per token.
+_STATIC_TOKENS = {kw: ("KEYWORD", kw) for kw in KEYWORDS}
+_STATIC_TOKENS.update((ch, ("OP", ch)) for ch in _OP_CHARS)
+
+# ASCII character classes. _DISPATCH maps ord(ch) to a class and _CANDIDATES maps the
+# class to a master regex: the specs that can match starting at ch, joined in spec order
+# as one alternation of groups, plus the kind code for each group (indexed by lastindex).
+# Whitespace, newlines, comments and words are consumed inline and never reach it.
+_CH_OTHER, _CH_SPACE, _CH_NEWLINE, _CH_DIGIT, _CH_WORD, _CH_QUOTE, _CH_DASH, _CH_OP, _CH_UNICODE = range(9)
+
+_DISPATCH = bytearray(128)
+for _c in " \t\r":
+    _DISPATCH[ord(_c)] = _CH_SPACE
+_DISPATCH[ord("\n")] = _CH_NEWLINE
+for _c in "0123456789":
+    _DISPATCH[ord(_c)] = _CH_DIGIT
+for _c in "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_":
+    _DISPATCH[ord(_c)] = _CH_WORD
+_DISPATCH[ord('"')] = _CH_QUOTE
+for _c in _OP_CHARS:
+    _DISPATCH[ord(_c)] = _CH_OP
+_DISPATCH[ord("-")] = _CH_DASH
+del _c
+
+
+def _master_for(*types: str) -> Tuple["re.Pattern[str]", Tuple[int, ...]]:
+    specs = [(typ, pattern) for typ, pattern in TOKEN_SPECS if typ in types]
+    regex = re.compile("|".join(f"({pattern})" for _, pattern in specs))
+    return regex, (-1,) + tuple(_KIND_CODE[typ] for typ, _ in specs)
+
+
+_CANDIDATES = (
+    _master_for("MISMATCH"),                                     # _CH_OTHER
+    None,                                                        # _CH_SPACE (inline)
+    None,                                                        # _CH_NEWLINE (inline)
+    _master_for("NUMBER", "MISMATCH"),                           # _CH_DIGIT
+    None,                                                        # _CH_WORD (inline)
+    _master_for("STRING", "MISMATCH"),                           # _CH_QUOTE
+    _master_for("OP"),                                           # _CH_DASH ("--" is inline)
+    None,                                                        # _CH_OP (inline)
+    _master_for("KEYWORD", "IDENT", "NUMBER", "STRING", "OP", "MISMATCH"),  # _CH_UNICODE
+)
 
-def tokenize(code: str) -> List[Tuple[str, str]]:
+
+class TokenStream:
     """
-    Tokenize Trion source `code` and return list of (type, value) tuples.
+    Struct-of-arrays token storage.
 
-    Whitespace, comments and newline tokens are ignored (not returned).
+    Each token is described by its kind code and its [start, end) span in `source`,
+    plus the 1-based line/column where it starts. Indexing returns the same
+    (type, value) tuple `tokenize` produces, built on demand.
     """
-    tokens: List[Tuple[str, str]] = []
+
+    __slots__ = ("source", "kinds", "starts", "ends", "lines", "cols")
+
+    def __init__(self, source: str):
+        self.source = source
+        self.kinds = array("b")
+        self.starts = array("i")
+        self.ends = array("i")
+        self.lines = array("i")
+        self.cols = array("i")
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getitem__(self, i: int) -> Tuple[str, str]:
+        kind = self.kinds[i]
+        value = self.source[self.starts[i]:self.ends[i]]
+        if kind == _KEYWORD or kind == _OP:
+            return _STATIC_TOKENS[value]
+        return (TOKEN_KINDS[kind], value)
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        source = self.source
+        for kind, start, end in zip(self.kinds, self.starts, self.ends):
+            if kind == _KEYWORD or kind == _OP:
+                yield _STATIC_TOKENS[source[start:end]]
+            else:
+                yield (TOKEN_KINDS[kind], source[start:end])
+
+    def value(self, i: int) -> str:
+        """Return the source text of token `i`."""
+        return self.source[self.starts[i]:self.ends[i]]
+
+    def __repr__(self) -> str:
+        return f"TokenStream(tokens={len(self)}, chars={len(self.source)})"
+
+
+def tokenize_stream(code: str) -> TokenStream:
+    """
+    Tokenize Trion source `code` into a `TokenStream`.
+
+    Whitespace, comments and newline tokens are ignored (not stored).
+    """
+    stream = TokenStream(code)
+    # bound methods and module tables as locals: the loop body runs once per token
+    add_kind, add_start, add_end = stream.kinds.append, stream.starts.append, stream.ends.append
+    add_line, add_col = stream.lines.append, stream.cols.append
+    dispatch = _DISPATCH
+    skip_match = _SKIP_RE.match
+    ident_match = _IDENT_RE.match
+    word_char_match = _WORD_CHAR_RE.match
+    keyword_set = _KEYWORD_SET
+    find = code.find
     pos = 0
     length = len(code)
+    line = 1
+    line_start = 0
 
     while pos < length:
-        for typ, regex in _TOKEN_REGEXES:
-            m = regex.match(code, pos)
-            if not m:
+        o = ord(code[pos])
+        cls = dispatch[o] if o < 128 else _CH_UNICODE
+        # whitespace runs are skipped in a single regex call
+        if cls == _CH_SPACE:
+            pos = skip_match(code, pos).end()
+            continue
+        if cls == _CH_NEWLINE:
+            pos += 1
+            line += 1
+            line_start = pos
+            continue
+        # "--" comments run to the end of the line; the newline itself is lexed next
+        if cls == _CH_DASH and code.startswith("-", pos + 1):
+            pos = find("\n", pos)
+            if pos == -1:
+                pos = length
+            continue
+        # operator fast path (a lone "-" falls through to the OP regex)
+        if cls == _CH_OP:
+            add_kind(_OP)
+            add_start(pos)
+            add_end(pos + 1)
+            add_line(line)
+            add_col(pos - line_start + 1)
+            pos += 1
+            continue
+        # identifiers and keywords: one IDENT match, then a set lookup
+        if cls == _CH_WORD:
+            end = ident_match(code, pos).end()
+            kind = _IDENT
+            if (code[pos:end] in keyword_set
+                    and not (pos and word_char_match(code, pos - 1))
+                    and not word_char_match(code, end)):
+                kind = _KEYWORD
+            add_kind(kind)
+            add_start(pos)
+            add_end(end)
+            add_line(line)
+            add_col(pos - line_start + 1)
+            pos = end
+            continue
+        # string fast path: without escapes the literal ends at the next quote
+        if cls == _CH_QUOTE:
+            q = find('"', pos + 1)
+            if q != -1 and find("\\", pos + 1, q) == -1:
+                add_kind(_STRING)
+                add_start(pos)
+                add_end(q + 1)
+                add_line(line)
+                add_col(pos - line_start + 1)
+                nl = code.count("\n", pos, q)
+                if nl:
+                    line += nl
+                    line_start = code.rfind("\n", pos, q) + 1
+                pos = q + 1
                 continue
-            text = m.group(0)
+        master, group_kinds = _CANDIDATES[cls]
+        m = master.match(code, pos)
+        if m:
+            kind = group_kinds[m.lastindex]
+            start = pos
             pos = m.end()
-            # skip these token types
-            if typ in ("SKIP", "COMMENT", "NEWLINE"):
-                break
-            tokens.append((typ, text))
-            break
+            add_kind(kind)
+            add_start(start)
+            add_end(pos)
+            add_line(line)
+            add_col(start - line_start + 1)
+            if kind == _STRING:
+                # string literals may span lines
+                nl = code.count("\n", start, pos)
+                if nl:
+                    line += nl
+                    line_start = code.rfind("\n", start, pos) + 1
         else:
             # Should not happen because MISMATCH will always match; safety fallback
-            tokens.append(("MISMATCH", code[pos]))
+            add_kind(_MISMATCH)
+            add_start(pos)
+            add_end(pos + 1)
+            add_line(line)
+            add_col(pos - line_start + 1)
             pos += 1
 
-    return tokens
+    return stream
+
+
+def tokenize(code: str) -> List[Tuple[str, str]]:
+    """
+    Tokenize Trion source `code` and return list of (type, value) tuples.
+
+    Whitespace, comments and newline tokens are ignored (not returned).
+    """
+    stream = tokenize_stream(code)
+    # TokenStream defines __len__, so list() allocates the result once at its exact
+    # final size instead of growing it append by append.
+    return list(stream)
 
 
 if __name__ == "__main__":
@@ -69,7 +275,7 @@ if __name__ == "__main__":
     for t in tokenize(sample):
         print(t)
 
-from typing import Any, List, Optional, Tuple
+from typing import Any, List, Optional, Tuple, Union
 from ast import (
     Program as AstProgram,
     MainBlock as AstMainBlock,
@@ -78,6 +284,8 @@ from ast import (
     PrintStmt,
     RuleStmt,
 )
+from array import array
+from lexer import TOKEN_KINDS, TokenStream
 
 """
 parser.py
@@ -243,132 +451,188 @@ def _parse_statement_to_node(s: str):
 # Parser implementation
 # -------------------------
 
+# Kind codes as stored in TokenStream.kinds (-1 for kinds the lexer does not produce)
+_KIND_CODE = {typ: i for i, typ in enumerate(TOKEN_KINDS)}
+_KEYWORD = _KIND_CODE["KEYWORD"]
+_IDENT = _KIND_CODE["IDENT"]
+# bytes.translate table mapping a kind-code byte to 1 for KEYWORD and 0 otherwise
+_IS_KEYWORD_TABLE = bytes(int(b == _KEYWORD) for b in range(256))
+
+# Keywords that end a Main block
+_BLOCK_KEYWORDS = frozenset(("Main", "Capsule", "EndCapsule"))
+
+
+def _next_keyword(is_kw: bytearray, pos: int, n: int) -> int:
+    """Index of the first KEYWORD token at or after `pos` (or `n`), via a C-level byte scan."""
+    i = is_kw.find(1, pos)
+    return n if i == -1 else i
+
 
 class Parser:
-    def __init__(self, tokens: List[Tuple[str, str]]):
-        self.tokens = list(tokens)
+    __slots__ = ("tokens", "kinds", "length", "pos", "_value", "_values", "_is_kw")
+
+    def __init__(self, tokens: Union[List[Tuple[str, str]], TokenStream]):
+        # Tokens are read through parallel kind/value views rather than (type, value)
+        # tuples: a TokenStream is used as-is (values sliced from the source on demand),
+        # a list is split once into a kind-code array and a value list.
+        if isinstance(tokens, TokenStream):
+            self.tokens = tokens
+            self.kinds = tokens.kinds
+            self._value = tokens.value
+        else:
+            self.tokens = list(tokens)
+            self.kinds = array("b", [_KIND_CODE.get(t[0], -1) for t in self.tokens])
+            self._values = [t[1] for t in self.tokens]
+            self._value = self._values.__getitem__
+        # token count is fixed for the whole parse; self.pos >= self.length means EOF
+        self.length = len(self.tokens)
         self.pos = 0
+        # _is_kw[i] is 1 when token i is a KEYWORD; lets the statement loops test
+        # token boundaries with a byte read instead of indexing and unpacking a tuple
+        self._is_kw = bytearray(self.kinds.tobytes().translate(_IS_KEYWORD_TABLE))
+
+    def _text(self, start: int, end: int) -> str:
+        """Space-joined values of tokens [start, end)."""
+        tokens = self.tokens
+        if isinstance(tokens, TokenStream):
+            src = tokens.source
+            return " ".join([src[s:e] for s, e in zip(tokens.starts[start:end], tokens.ends[start:end])])
+        return " ".join(self._values[start:end])
 
     # Main parse loop: walks through all tokens and constructs AST nodes
     def parse(self) -> Program:
+        value = self._value
+        n = self.length
+        is_kw = self._is_kw
         nodes: List[Any] = []
-        while not self._eof():
-            if self._match("KEYWORD", "Main"):
-                nodes.append(self._parse_main())
-            elif self._match("KEYWORD", "Capsule"):
-                nodes.append(self._parse_capsule())
-            else:
-                # skip unknown or stray tokens
-                self._advance()
+        while self.pos < n:
+            if is_kw[self.pos]:
+                parse_block = _TOP_LEVEL_PARSERS.get(value(self.pos))
+                if parse_block is not None:
+                    nodes.append(parse_block(self))
+                    continue
+            # skip unknown or stray tokens up to the next keyword
+            self.pos = _next_keyword(is_kw, self.pos + 1, n)
         return Program(nodes)
 
-    # Utility helpers
+    # Utility helpers (the parse loops read kinds/values directly; these serve cold paths)
     def _eof(self) -> bool:
-        return self.pos >= len(self.tokens)
+        return self.pos >= self.length
 
     def _peek(self) -> Tuple[Optional[str], Optional[str]]:
-        if self._eof():
+        pos = self.pos
+        if pos >= self.length:
             return (None, None)
-        return self.tokens[self.pos]
+        return self.tokens[pos]
 
     def _advance(self) -> Tuple[Optional[str], Optional[str]]:
-        if self._eof():
+        pos = self.pos
+        if pos >= self.length:
             return (None, None)
-        t = self.tokens[self.pos]
-        self.pos += 1
-        return t
+        self.pos = pos + 1
+        return self.tokens[pos]
 
     # Utility to match current token type and optional value
     def _match(self, typ: str, val: Optional[str] = None) -> bool:
-        if self._eof():
+        pos = self.pos
+        if pos >= self.length:
             return False
-        t_type, t_val = self._peek()
-        if t_type == typ and (val is None or t_val == val):
-            return True
-        return False
+        code = _KIND_CODE.get(typ)
+        if code is not None:
+            # known kinds compare as small ints; the value is only fetched on a kind hit
+            return self.kinds[pos] == code and (val is None or self._value(pos) == val)
+        t_type, t_val = self.tokens[pos]
+        return t_type == typ and (val is None or t_val == val)
 
     # Parse a Main block definition
     def _parse_main(self) -> MainBlock:
+        value = self._value
+        n = self.length
+        is_kw = self._is_kw
         # consume 'Main'
-        self._advance()
+        pos = self.pos + 1
         # Create MainBlock and collect any following statements until a top-level keyword.
         mb = MainBlock()
         # Collect tokens until we encounter a top-level KEYWORD (Main/Capsule/EndCapsule) or EOF
-        while not self._eof():
-            t_type, t_val = self._peek()
-            if t_type == "KEYWORD" and t_val in ("Main", "Capsule", "EndCapsule"):
+        while pos < n:
+            if is_kw[pos] and value(pos) in _BLOCK_KEYWORDS:
                 break
-            # gather fragments into a single string per line-like statement
-            if t_type is None:
-                self._advance()
-                continue
-            # consume contiguous non-KEYWORD tokens as one fragment
-            parts: List[str] = []
-            while not self._eof() and self._peek()[0] != "KEYWORD":
-                tok = self._advance()[1]
-                if tok is not None:
-                    parts.append(tok)
-            frag = " ".join(parts).strip()
+            # gather contiguous non-KEYWORD tokens into a single string per line-like statement
+            start = pos
+            pos = _next_keyword(is_kw, pos, n)
+            frag = self._text(start, pos).strip()
             if frag:
                 mb.add(frag)
             # if next token is KEYWORD we will break on next loop iteration
+        self.pos = pos
         return mb
 
     # Parse a Capsule declaration with name and a simple list of statements
     def _parse_capsule(self) -> Capsule:
+        value = self._value
+        n = self.length
+        is_kw = self._is_kw
         # consume 'Capsule'
-        self._advance()
+        pos = self.pos + 1
         # expect identifier for capsule name
-        if not self._match("IDENT"):
+        if pos < n and self.kinds[pos] == _IDENT:
+            name = value(pos)
+            pos += 1
+        else:
             # fallback: use a placeholder name and continue
             name = "<anonymous>"
-        else:
-            _, name = self._advance()
 
         capsule = Capsule(name)
+        # stray non-KEYWORD fragments, joined onto the last body entry in one go
+        pending: List[str] = []
 
         # Collect simple statements until EndCapsule is encountered.
         # A statement is heuristically started by a KEYWORD and continues until the next KEYWORD
         # or until EndCapsule. This is intentionally simple and tolerant; more precise parsing
         # can be added later.
-        while not self._eof() and not self._match("KEYWORD", "EndCapsule"):
-            t_type, t_val = self._peek()
-            if t_type == "KEYWORD":
-                # start a new statement
-                stmt_parts: List[str] = []
-                # include the starting keyword (e.g. Print, Rule, Isolate)
-                first = self._advance()[1]
-                if first is not None:
-                    stmt_parts.append(first)
-                # consume following non-KEYWORD tokens as part of this statement
-                while not self._eof() and self._peek()[0] != "KEYWORD":
-                    next_tok = self._advance()[1]
-                    if next_tok is not None:
-                        stmt_parts.append(next_tok)
-                stmt = " ".join(part for part in stmt_parts if part is not None).strip()
+        while pos < n:
+            if is_kw[pos]:
+                if value(pos) == "EndCapsule":
+                    # consume EndCapsule
+                    pos += 1
+                    break
+                self._flush_strays(capsule, pending)
+                # start a new statement, including the starting keyword (e.g. Print, Rule, Isolate),
+                # and consume following non-KEYWORD tokens as part of it
+                start = pos
+                pos = _next_keyword(is_kw, pos + 1, n)
+                stmt = self._text(start, pos).strip()
                 if stmt:
                     capsule.add(stmt)
             else:
-                # For non-keyword stray tokens, consume and append as a raw fragment
-                frag = self._advance()[1]
-                if frag is None:
-                    continue
-                if len(capsule.body) == 0:
-                    capsule.add(frag)
-                else:
-                    # append to last entry with a space
-                    last = capsule.body[-1]
-                    if isinstance(last, str):
-                        capsule.body[-1] = last + " " + frag
-                    else:
-                        capsule.add(frag)
-
-        # consume EndCapsule if present
-        if self._match("KEYWORD", "EndCapsule"):
-            self._advance()
+                # For non-keyword stray tokens, consume and buffer as a raw fragment
+                pending.append(value(pos))
+                pos += 1
+        self._flush_strays(capsule, pending)
 
+        self.pos = pos
         return capsule
 
+    @staticmethod
+    def _flush_strays(capsule: Capsule, pending: List[str]) -> None:
+        """Append buffered stray fragments to the last string entry (or as a new one)."""
+        if not pending:
+            return
+        frag = " ".join(pending)
+        if capsule.body and isinstance(capsule.body[-1], str):
+            # append to last entry with a space
+            capsule.body[-1] = capsule.body[-1] + " " + frag
+        else:
+            capsule.add(frag)
+        pending.clear()
+
+
+# Top-level keyword -> block parser, dispatched once per keyword in Parser.parse
+_TOP_LEVEL_PARSERS = {
+    "Main": Parser._parse_main,
+    "Capsule": Parser._parse_capsule,
+}
+
 
 # -------------------------
 # Minimal self-test / example
@@ -427,6 +691,9 @@ import inspect
 Pattern = Dict[str, Any]
 Action = Callable[[Any], Optional[Any]]  # action(node) -> replacement or None
 
+# Marks an attribute the node does not have (None can be a legitimate value)
+_MISSING = object()
+
 
 class PatternRule:
     def __init__(self, name: str, pattern: Pattern, action: Optional[Action] = None, description: str = ""):
@@ -450,12 +717,14 @@ class PatternRule:
         if t:
             if type(node).__name__ != t:
                 return False
-        # Match attributes
-        attrs = self.pattern.get("attrs", {})
+        # Match attributes (no default dict: this runs for every node x rule pair)
+        attrs = self.pattern.get("attrs")
+        if not attrs:
+            return True
         for k, expected in attrs.items():
-            if not hasattr(node, k):
+            val = getattr(node, k, _MISSING)
+            if val is _MISSING:
                 return False
-            val = getattr(node, k)
             if callable(expected):
                 try:
                     if not expected(val):
@@ -529,15 +798,28 @@ class PatternEngine:
         """
         Yields tuples (parent, attr_name, child_node) for nodes found in the AST.
         For top-level nodes in Program.body, parent is the Program instance and attr_name is 'body'.
+
+        Pre-order, driven by an explicit stack of child iterators so deep trees neither
+        hit the recursion limit nor pay a `yield from` hop per level for every node.
         """
+        stack = [self._iter_children(node)]
+        while stack:
+            for entry in stack[-1]:
+                yield entry
+                # descend into the child before continuing with its siblings
+                stack.append(self._iter_children(entry[2]))
+                break
+            else:
+                stack.pop()
+
+    def _iter_children(self, node: Any):
+        """Yield (node, attr_info, child) for the direct children of `node`."""
         if node is None:
             return
         # If this is a Program with a `body` attribute (list)
         if hasattr(node, "body") and isinstance(node.body, list):
             for idx, child in enumerate(node.body):
                 yield (node, ("body", idx), child)
-                # Recurse into child
-                yield from self._walk_with_parents(child)
             return
         # If node has attributes that are lists or nested nodes, attempt to traverse common shapes
         for name, value in inspect.getmembers(node, lambda v: not(inspect.isroutine(v))):
@@ -549,10 +831,8 @@ class PatternEngine:
                 for idx, item in enumerate(value):
                     if self._is_ast_node(item):
                         yield (node, (name, idx), item)
-                        yield from self._walk_with_parents(item)
             elif self._is_ast_node(value):
                 yield (node, (name, None), value)
-                yield from self._walk_with_parents(value)
 
     @staticmethod
     def _is_ast_node(obj: Any) -> bool:
@@ -850,7 +1130,6 @@ from typing import Dict, List, Any
 import re
 import textwrap
 import os
-import argparse
 
 _START_RE = re.compile(r'--\s*nasm-start(?::|\s+)?(.*)$')
 _END_RE = re.compile(r'--\s*nasm-end\b')
@@ -947,6 +1226,9 @@ def extract_nasm_blocks_from_file(path: str) -> List[Dict[str, Any]]:
 
 if __name__ == "__main__":
     # CLI: print summaries, optionally dump contents or write blocks to files
+    # (argparse is only needed here, so importers of this module don't pay for it)
+    import argparse
+
     parser = argparse.ArgumentParser(description="Extract inline NASM blocks from a Trion source file.")
     parser.add_argument("path", help="Trion source file (.trn)")
     parser.add_argument("--dump", action="store_true", help="Print full content of each extracted NASM block")
@@ -1214,8 +1496,9 @@ class Codegen:
         """
         Return (and create if needed) a global constant holding `text\0`.
         """
-        if text in self._str_constants:
-            return self._str_constants[text]
+        gv = self._str_constants.get(text)
+        if gv is not None:
+            return gv
         data = text.encode("utf8") + b"\x00"
         arr_ty = ir.ArrayType(ir.IntType(8), len(data))
         # initializer expects a bytes-like or list of ints
@@ -1247,8 +1530,9 @@ class Codegen:
         """
         name = _sanitize_name(getattr(capsule, "name", "capsule"))
         func_name = f"capsule_{name}"
-        if func_name in self._capsule_funcs:
-            return self._capsule_funcs[func_name]
+        func = self._capsule_funcs.get(func_name)
+        if func is not None:
+            return func
 
         func_ty = ir.FunctionType(ir.VoidType(), [])
         func = ir.Function(self.module, func_ty, name=func_name)
@@ -1302,23 +1586,10 @@ class Codegen:
         # Emit all capsule functions first
         calls = []
         for node in getattr(program, "body", []):
-            tname = type(node).__name__
-            if tname == "Capsule":
-                fn = self.emit_capsule(node)
+            emit = _TOP_LEVEL_EMITTERS.get(type(node).__name__, Codegen._emit_unknown)
+            fn = emit(self, node)
+            if fn is not None:
                 calls.append(fn)
-            elif tname == "Main" or tname == "MainBlock":
-                # create an empty helper function for MainBlock for symmetry
-                mainblk_name = "main_block"
-                if mainblk_name not in self._capsule_funcs:
-                    fb = ir.Function(self.module, ir.FunctionType(ir.VoidType(), []), name=mainblk_name)
-                    b = fb.append_basic_block("entry")
-                    ir.IRBuilder(b).ret_void()
-                    self._capsule_funcs[mainblk_name] = fb
-                calls.append(self._capsule_funcs[mainblk_name])
-            else:
-                # unknown top-level node: attempt to emit if it has a `name` attr and body
-                if hasattr(node, "name") and hasattr(node, "body"):
-                    calls.append(self.emit_capsule(node))
 
         # Call each capsule/function in order
         for fn in calls:
@@ -1329,6 +1600,22 @@ class Codegen:
         self.builder = None
         return main_fn
 
+    def _emit_main_block(self, node: Any) -> ir.Function:
+        # create an empty helper function for MainBlock for symmetry
+        mainblk_name = "main_block"
+        if mainblk_name not in self._capsule_funcs:
+            fb = ir.Function(self.module, ir.FunctionType(ir.VoidType(), []), name=mainblk_name)
+            b = fb.append_basic_block("entry")
+            ir.IRBuilder(b).ret_void()
+            self._capsule_funcs[mainblk_name] = fb
+        return self._capsule_funcs[mainblk_name]
+
+    def _emit_unknown(self, node: Any):
+        # unknown top-level node: attempt to emit if it has a `name` attr and body
+        if hasattr(node, "name") and hasattr(node, "body"):
+            return self.emit_capsule(node)
+        return None
+
     def generate(self, program: Any):
         """
         Top-level entry: generate module contents for a Program AST node.
@@ -1350,6 +1637,14 @@ class Codegen:
             f.write(str(self.module))
             print(f"LLVM IR written to {path}")
 
+
+# Top-level node type name -> emitter, dispatched once per node in Codegen.emit_main
+_TOP_LEVEL_EMITTERS = {
+    "Capsule": Codegen.emit_capsule,
+    "Main": Codegen._emit_main_block,
+    "MainBlock": Codegen._emit_main_block,
+}
+
 """
 TrionPatternAI.py
 Pattern matching and deduction helpers for the Trion compiler.
@@ -1378,6 +1673,9 @@ import inspect
 Pattern = Dict[str, Any]
 Action = Callable[[Any], Optional[Any]]  # action(node) -> replacement or None
 
+# Marks an attribute the node does not have (None can be a legitimate value)
+_MISSING = object()
+
 
 class PatternRule:
     def __init__(self, name: str, pattern: Pattern, action: Optional[Action] = None, description: str = ""):
@@ -1401,12 +1699,14 @@ class PatternRule:
         if t:
             if type(node).__name__ != t:
                 return False
-        # Match attributes
-        attrs = self.pattern.get("attrs", {})
+        # Match attributes (no default dict: this runs for every node x rule pair)
+        attrs = self.pattern.get("attrs")
+        if not attrs:
+            return True
         for k, expected in attrs.items():
-            if not hasattr(node, k):
+            val = getattr(node, k, _MISSING)
+            if val is _MISSING:
                 return False
-            val = getattr(node, k)
             if callable(expected):
                 try:
                     if not expected(val):
@@ -1480,15 +1780,28 @@ class PatternEngine:
         """
         Yields tuples (parent, attr_name, child_node) for nodes found in the AST.
         For top-level nodes in Program.body, parent is the Program instance and attr_name is 'body'.
+
+        Pre-order, driven by an explicit stack of child iterators so deep trees neither
+        hit the recursion limit nor pay a `yield from` hop per level for every node.
         """
+        stack = [self._iter_children(node)]
+        while stack:
+            for entry in stack[-1]:
+                yield entry
+                # descend into the child before continuing with its siblings
+                stack.append(self._iter_children(entry[2]))
+                break
+            else:
+                stack.pop()
+
+    def _iter_children(self, node: Any):
+        """Yield (node, attr_info, child) for the direct children of `node`."""
         if node is None:
             return
         # If this is a Program with a `body` attribute (list)
         if hasattr(node, "body") and isinstance(node.body, list):
             for idx, child in enumerate(node.body):
                 yield (node, ("body", idx), child)
-                # Recurse into child
-                yield from self._walk_with_parents(child)
             return
         # If node has attributes that are lists or nested nodes, attempt to traverse common shapes
         for name, value in inspect.getmembers(node, lambda v: not(inspect.isroutine(v))):
@@ -1500,10 +1813,8 @@ class PatternEngine:
                 for idx, item in enumerate(value):
                     if self._is_ast_node(item):
                         yield (node, (name, idx), item)
-                        yield from self._walk_with_parents(item)
             elif self._is_ast_node(value):
                 yield (node, (name, None), value)
-                yield from self._walk_with_parents(value)
 
     @staticmethod
     def _is_ast_node(obj: Any) -> bool:
@@ -5,17 +5,26 @@ Tokenizer for Trion language.
 
 Produces a list of (type, value) tuples suitable for the simple parser.
 Ignores whitespace, comments and newlines. Keywords are matched before identifiers.
+
+For large inputs `tokenize_stream` returns a `TokenStream`: token kinds, spans and
+positions are kept in parallel arrays and values are sliced from the source on demand.
 """
 
 import re
-from typing import List, Tuple
+from array import array
+from typing import Iterator, List, Tuple
+
+KEYWORDS: Tuple[str, ...] = (
+    "Main", "Capsule", "If", "Then", "Else", "Elseif", "While", "For", "EndCapsule",
+    "Print", "Isolate", "Try", "Execute", "Fail", "True", "False",
+)
 
 # Ordered token specs: order matters (KEYWORD before IDENT)
 TOKEN_SPECS = [
     ("SKIP",     r"[ \t\r]+"),                             # spaces and tabs
     ("COMMENT",  r"--[^\n]*"),                             # -- comment to end of line
     ("NEWLINE",  r"\n"),                                   # newline
-    ("KEYWORD",  r"\b(?:Main|Capsule|If|Then|Else|Elseif|While|For|EndCapsule|Print|Isolate|Try|Execute|Fail|True|False)\b"),
+    ("KEYWORD",  r"\b(?:" + "|".join(KEYWORDS) + r")\b"),
     ("IDENT",    r"[A-Za-z_][A-Za-z0-9_]*"),               # identifiers
     ("NUMBER",   r"\b\d+\b"),                              # integers
     ("STRING",   r'"(?:\\.|[^"\\])*"'),                    # double-quoted strings with escapes
@@ -26,35 +35,232 @@ TOKEN_SPECS = [
 # Precompile regexes for performance
 _TOKEN_REGEXES = [(typ, re.compile(pattern)) for typ, pattern in TOKEN_SPECS]
 
+# Token kind names indexed by the small integer codes stored in TokenStream.kinds
+TOKEN_KINDS: Tuple[str, ...] = tuple(typ for typ, _ in TOKEN_SPECS)
+_KIND_CODE = {typ: i for i, typ in enumerate(TOKEN_KINDS)}
+_MISMATCH = _KIND_CODE["MISMATCH"]
+_OP = _KIND_CODE["OP"]
+_STRING = _KIND_CODE["STRING"]
+_KEYWORD = _KIND_CODE["KEYWORD"]
+_IDENT = _KIND_CODE["IDENT"]
+_SKIP_RE = dict(_TOKEN_REGEXES)["SKIP"]
+_IDENT_RE = dict(_TOKEN_REGEXES)["IDENT"]
 
-def tokenize(code: str) -> List[Tuple[str, str]]:
+# Words starting with an ASCII letter are matched once as IDENT and promoted to KEYWORD
+# by set lookup. _WORD_CHAR_RE reproduces the keyword regex's \b checks on either side.
+_KEYWORD_SET = frozenset(KEYWORDS)
+_WORD_CHAR_RE = re.compile(r"\w")
+
+# Single-character operators; emitted by tokenize_stream without a regex match
+_OP_CHARS = frozenset("+-*/<>=,:")
+
+# Keyword and operator tokens have a fixed set of values, so their (type, value) tuples
+# are built once here and shared by every occurrence instead of allocated per token.
+_STATIC_TOKENS = {kw: ("KEYWORD", kw) for kw in KEYWORDS}
+_STATIC_TOKENS.update((ch, ("OP", ch)) for ch in _OP_CHARS)
+
+# ASCII character classes. _DISPATCH maps ord(ch) to a class and _CANDIDATES maps the
+# class to a master regex: the specs that can match starting at ch, joined in spec order
+# as one alternation of groups, plus the kind code for each group (indexed by lastindex).
+# Whitespace, newlines, comments and words are consumed inline and never reach it.
+_CH_OTHER, _CH_SPACE, _CH_NEWLINE, _CH_DIGIT, _CH_WORD, _CH_QUOTE, _CH_DASH, _CH_OP, _CH_UNICODE = range(9)
+
+_DISPATCH = bytearray(128)
+for _c in " \t\r":
+    _DISPATCH[ord(_c)] = _CH_SPACE
+_DISPATCH[ord("\n")] = _CH_NEWLINE
+for _c in "0123456789":
+    _DISPATCH[ord(_c)] = _CH_DIGIT
+for _c in "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_":
+    _DISPATCH[ord(_c)] = _CH_WORD
+_DISPATCH[ord('"')] = _CH_QUOTE
+for _c in _OP_CHARS:
+    _DISPATCH[ord(_c)] = _CH_OP
+_DISPATCH[ord("-")] = _CH_DASH
+del _c
+
+
+def _master_for(*types: str) -> Tuple["re.Pattern[str]", Tuple[int, ...]]:
+    specs = [(typ, pattern) for typ, pattern in TOKEN_SPECS if typ in types]
+    regex = re.compile("|".join(f"({pattern})" for _, pattern in specs))
+    return regex, (-1,) + tuple(_KIND_CODE[typ] for typ, _ in specs)
+
+
+_CANDIDATES = (
+    _master_for("MISMATCH"),                                     # _CH_OTHER
+    None,                                                        # _CH_SPACE (inline)
+    None,                                                        # _CH_NEWLINE (inline)
+    _master_for("NUMBER", "MISMATCH"),                           # _CH_DIGIT
+    None,                                                        # _CH_WORD (inline)
+    _master_for("STRING", "MISMATCH"),                           # _CH_QUOTE
+    _master_for("OP"),                                           # _CH_DASH ("--" is inline)
+    None,                                                        # _CH_OP (inline)
+    _master_for("KEYWORD", "IDENT", "NUMBER", "STRING", "OP", "MISMATCH"),  # _CH_UNICODE
+)
+
+
+class TokenStream:
     """
-    Tokenize Trion source `code` and return list of (type, value) tuples.
+    Struct-of-arrays token storage.
 
-    Whitespace, comments and newline tokens are ignored (not returned).
+    Each token is described by its kind code and its [start, end) span in `source`,
+    plus the 1-based line/column where it starts. Indexing returns the same
+    (type, value) tuple `tokenize` produces, built on demand.
     """
-    tokens: List[Tuple[str, str]] = []
+
+    __slots__ = ("source", "kinds", "starts", "ends", "lines", "cols")
+
+    def __init__(self, source: str):
+        self.source = source
+        self.kinds = array("b")
+        self.starts = array("i")
+        self.ends = array("i")
+        self.lines = array("i")
+        self.cols = array("i")
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getitem__(self, i: int) -> Tuple[str, str]:
+        kind = self.kinds[i]
+        value = self.source[self.starts[i]:self.ends[i]]
+        if kind == _KEYWORD or kind == _OP:
+            return _STATIC_TOKENS[value]
+        return (TOKEN_KINDS[kind], value)
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        source = self.source
+        for kind, start, end in zip(self.kinds, self.starts, self.ends):
+            if kind == _KEYWORD or kind == _OP:
+                yield _STATIC_TOKENS[source[start:end]]
+            else:
+                yield (TOKEN_KINDS[kind], source[start:end])
+
+    def value(self, i: int) -> str:
+        """Return the source text of token `i`."""
+        return self.source[self.starts[i]:self.ends[i]]
+
+    def __repr__(self) -> str:
+        return f"TokenStream(tokens={len(self)}, chars={len(self.source)})"
+
+
+def tokenize_stream(code: str) -> TokenStream:
+    """
+    Tokenize Trion source `code` into a `TokenStream`.
+
+    Whitespace, comments and newline tokens are ignored (not stored).
+    """
+    stream = TokenStream(code)
+    # bound methods and module tables as locals: the loop body runs once per token
+    add_kind, add_start, add_end = stream.kinds.append, stream.starts.append, stream.ends.append
+    add_line, add_col = stream.lines.append, stream.cols.append
+    dispatch = _DISPATCH
+    skip_match = _SKIP_RE.match
+    ident_match = _IDENT_RE.match
+    word_char_match = _WORD_CHAR_RE.match
+    keyword_set = _KEYWORD_SET
+    find = code.find
     pos = 0
     length = len(code)
+    line = 1
+    line_start = 0
 
     while pos < length:
-        for typ, regex in _TOKEN_REGEXES:
-            m = regex.match(code, pos)
-            if not m:
+        o = ord(code[pos])
+        cls = dispatch[o] if o < 128 else _CH_UNICODE
+        # whitespace runs are skipped in a single regex call
+        if cls == _CH_SPACE:
+            pos = skip_match(code, pos).end()
+            continue
+        if cls == _CH_NEWLINE:
+            pos += 1
+            line += 1
+            line_start = pos
+            continue
+        # "--" comments run to the end of the line; the newline itself is lexed next
+        if cls == _CH_DASH and code.startswith("-", pos + 1):
+            pos = find("\n", pos)
+            if pos == -1:
+                pos = length
+            continue
+        # operator fast path (a lone "-" falls through to the OP regex)
+        if cls == _CH_OP:
+            add_kind(_OP)
+            add_start(pos)
+            add_end(pos + 1)
+            add_line(line)
+            add_col(pos - line_start + 1)
+            pos += 1
+            continue
+        # identifiers and keywords: one IDENT match, then a set lookup
+        if cls == _CH_WORD:
+            end = ident_match(code, pos).end()
+            kind = _IDENT
+            if (code[pos:end] in keyword_set
+                    and not (pos and word_char_match(code, pos - 1))
+                    and not word_char_match(code, end)):
+                kind = _KEYWORD
+            add_kind(kind)
+            add_start(pos)
+            add_end(end)
+            add_line(line)
+            add_col(pos - line_start + 1)
+            pos = end
+            continue
+        # string fast path: without escapes the literal ends at the next quote
+        if cls == _CH_QUOTE:
+            q = find('"', pos + 1)
+            if q != -1 and find("\\", pos + 1, q) == -1:
+                add_kind(_STRING)
+                add_start(pos)
+                add_end(q + 1)
+                add_line(line)
+                add_col(pos - line_start + 1)
+                nl = code.count("\n", pos, q)
+                if nl:
+                    line += nl
+                    line_start = code.rfind("\n", pos, q) + 1
+                pos = q + 1
                 continue
-            text = m.group(0)
+        master, group_kinds = _CANDIDATES[cls]
+        m = master.match(code, pos)
+        if m:
+            kind = group_kinds[m.lastindex]
+            start = pos
             pos = m.end()
-            # skip these token types
-            if typ in ("SKIP", "COMMENT", "NEWLINE"):
-                break
-            tokens.append((typ, text))
-            break
+            add_kind(kind)
+            add_start(start)
+            add_end(pos)
+            add_line(line)
+            add_col(start - line_start + 1)
+            if kind == _STRING:
+                # string literals may span lines
+                nl = code.count("\n", start, pos)
+                if nl:
+                    line += nl
+                    line_start = code.rfind("\n", start, pos) + 1
         else:
             # Should not happen because MISMATCH will always match; safety fallback
-            tokens.append(("MISMATCH", code[pos]))
+            add_kind(_MISMATCH)
+            add_start(pos)
+            add_end(pos + 1)
+            add_line(line)
+            add_col(pos - line_start + 1)
             pos += 1
 
-    return tokens
+    return stream
+
+
+def tokenize(code: str) -> List[Tuple[str, str]]:
+    """
+    Tokenize Trion source `code` and return list of (type, value) tuples.
+
+    Whitespace, comments and newline tokens are ignored (not returned).
+    """
+    stream = tokenize_stream(code)
+    # TokenStream defines __len__, so list() allocates the result once at its exact
+    # final size instead of growing it append by append.
+    return list(stream)
 
 
 if __name__ == "__main__":
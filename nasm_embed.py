@@ -23,7 +23,6 @@ from typing import Dict, List, Any
 import re
 import textwrap
 import os
-import argparse
 
 _START_RE = re.compile(r'--\s*nasm-start(?::|\s+)?(.*)$')
 _END_RE = re.compile(r'--\s*nasm-end\b')
@@ -120,6 +119,9 @@ def extract_nasm_blocks_from_file(path: str) -> List[Dict[str, Any]]:
 
 if __name__ == "__main__":
     # CLI: print summaries, optionally dump contents or write blocks to files
+    # (argparse is only needed here, so importers of this module don't pay for it)
+    import argparse
+
     parser = argparse.ArgumentParser(description="Extract inline NASM blocks from a Trion source file.")
     parser.add_argument("path", help="Trion source file (.trn)")
     parser.add_argument("--dump", action="store_true", help="Print full content of each extracted NASM block")
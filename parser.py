@@ -1,4 +1,4 @@
-from typing import Any, List, Optional, Tuple
+from typing import Any, List, Optional, Tuple, Union
 from ast import (
     Program as AstProgram,
     MainBlock as AstMainBlock,
@@ -7,6 +7,8 @@ from ast import (
     PrintStmt,
     RuleStmt,
 )
+from array import array
+from lexer import TOKEN_KINDS, TokenStream
 
 """
 parser.py
@@ -172,132 +174,188 @@ def _parse_statement_to_node(s: str):
 # Parser implementation
 # -------------------------
 
+# Kind codes as stored in TokenStream.kinds (-1 for kinds the lexer does not produce)
+_KIND_CODE = {typ: i for i, typ in enumerate(TOKEN_KINDS)}
+_KEYWORD = _KIND_CODE["KEYWORD"]
+_IDENT = _KIND_CODE["IDENT"]
+# bytes.translate table mapping a kind-code byte to 1 for KEYWORD and 0 otherwise
+_IS_KEYWORD_TABLE = bytes(int(b == _KEYWORD) for b in range(256))
+
+# Keywords that end a Main block
+_BLOCK_KEYWORDS = frozenset(("Main", "Capsule", "EndCapsule"))
+
+
+def _next_keyword(is_kw: bytearray, pos: int, n: int) -> int:
+    """Index of the first KEYWORD token at or after `pos` (or `n`), via a C-level byte scan."""
+    i = is_kw.find(1, pos)
+    return n if i == -1 else i
+
 
 class Parser:
-    def __init__(self, tokens: List[Tuple[str, str]]):
-        self.tokens = list(tokens)
+    __slots__ = ("tokens", "kinds", "length", "pos", "_value", "_values", "_is_kw")
+
+    def __init__(self, tokens: Union[List[Tuple[str, str]], TokenStream]):
+        # Tokens are read through parallel kind/value views rather than (type, value)
+        # tuples: a TokenStream is used as-is (values sliced from the source on demand),
+        # a list is split once into a kind-code array and a value list.
+        if isinstance(tokens, TokenStream):
+            self.tokens = tokens
+            self.kinds = tokens.kinds
+            self._value = tokens.value
+        else:
+            self.tokens = list(tokens)
+            self.kinds = array("b", [_KIND_CODE.get(t[0], -1) for t in self.tokens])
+            self._values = [t[1] for t in self.tokens]
+            self._value = self._values.__getitem__
+        # token count is fixed for the whole parse; self.pos >= self.length means EOF
+        self.length = len(self.tokens)
         self.pos = 0
+        # _is_kw[i] is 1 when token i is a KEYWORD; lets the statement loops test
+        # token boundaries with a byte read instead of indexing and unpacking a tuple
+        self._is_kw = bytearray(self.kinds.tobytes().translate(_IS_KEYWORD_TABLE))
+
+    def _text(self, start: int, end: int) -> str:
+        """Space-joined values of tokens [start, end)."""
+        tokens = self.tokens
+        if isinstance(tokens, TokenStream):
+            src = tokens.source
+            return " ".join([src[s:e] for s, e in zip(tokens.starts[start:end], tokens.ends[start:end])])
+        return " ".join(self._values[start:end])
 
     # Main parse loop: walks through all tokens and constructs AST nodes
     def parse(self) -> Program:
+        value = self._value
+        n = self.length
+        is_kw = self._is_kw
         nodes: List[Any] = []
-        while not self._eof():
-            if self._match("KEYWORD", "Main"):
-                nodes.append(self._parse_main())
-            elif self._match("KEYWORD", "Capsule"):
-                nodes.append(self._parse_capsule())
-            else:
-                # skip unknown or stray tokens
-                self._advance()
+        while self.pos < n:
+            if is_kw[self.pos]:
+                parse_block = _TOP_LEVEL_PARSERS.get(value(self.pos))
+                if parse_block is not None:
+                    nodes.append(parse_block(self))
+                    continue
+            # skip unknown or stray tokens up to the next keyword
+            self.pos = _next_keyword(is_kw, self.pos + 1, n)
         return Program(nodes)
 
-    # Utility helpers
+    # Utility helpers (the parse loops read kinds/values directly; these serve cold paths)
     def _eof(self) -> bool:
-        return self.pos >= len(self.tokens)
+        return self.pos >= self.length
 
     def _peek(self) -> Tuple[Optional[str], Optional[str]]:
-        if self._eof():
+        pos = self.pos
+        if pos >= self.length:
             return (None, None)
-        return self.tokens[self.pos]
+        return self.tokens[pos]
 
     def _advance(self) -> Tuple[Optional[str], Optional[str]]:
-        if self._eof():
+        pos = self.pos
+        if pos >= self.length:
             return (None, None)
-        t = self.tokens[self.pos]
-        self.pos += 1
-        return t
+        self.pos = pos + 1
+        return self.tokens[pos]
 
     # Utility to match current token type and optional value
     def _match(self, typ: str, val: Optional[str] = None) -> bool:
-        if self._eof():
+        pos = self.pos
+        if pos >= self.length:
             return False
-        t_type, t_val = self._peek()
-        if t_type == typ and (val is None or t_val == val):
-            return True
-        return False
+        code = _KIND_CODE.get(typ)
+        if code is not None:
+            # known kinds compare as small ints; the value is only fetched on a kind hit
+            return self.kinds[pos] == code and (val is None or self._value(pos) == val)
+        t_type, t_val = self.tokens[pos]
+        return t_type == typ and (val is None or t_val == val)
 
     # Parse a Main block definition
     def _parse_main(self) -> MainBlock:
+        value = self._value
+        n = self.length
+        is_kw = self._is_kw
         # consume 'Main'
-        self._advance()
+        pos = self.pos + 1
         # Create MainBlock and collect any following statements until a top-level keyword.
         mb = MainBlock()
         # Collect tokens until we encounter a top-level KEYWORD (Main/Capsule/EndCapsule) or EOF
-        while not self._eof():
-            t_type, t_val = self._peek()
-            if t_type == "KEYWORD" and t_val in ("Main", "Capsule", "EndCapsule"):
+        while pos < n:
+            if is_kw[pos] and value(pos) in _BLOCK_KEYWORDS:
                 break
-            # gather fragments into a single string per line-like statement
-            if t_type is None:
-                self._advance()
-                continue
-            # consume contiguous non-KEYWORD tokens as one fragment
-            parts: List[str] = []
-            while not self._eof() and self._peek()[0] != "KEYWORD":
-                tok = self._advance()[1]
-                if tok is not None:
-                    parts.append(tok)
-            frag = " ".join(parts).strip()
+            # gather contiguous non-KEYWORD tokens into a single string per line-like statement
+            start = pos
+            pos = _next_keyword(is_kw, pos, n)
+            frag = self._text(start, pos).strip()
             if frag:
                 mb.add(frag)
             # if next token is KEYWORD we will break on next loop iteration
+        self.pos = pos
         return mb
 
     # Parse a Capsule declaration with name and a simple list of statements
     def _parse_capsule(self) -> Capsule:
+        value = self._value
+        n = self.length
+        is_kw = self._is_kw
         # consume 'Capsule'
-        self._advance()
+        pos = self.pos + 1
         # expect identifier for capsule name
-        if not self._match("IDENT"):
+        if pos < n and self.kinds[pos] == _IDENT:
+            name = value(pos)
+            pos += 1
+        else:
             # fallback: use a placeholder name and continue
             name = "<anonymous>"
-        else:
-            _, name = self._advance()
 
         capsule = Capsule(name)
+        # stray non-KEYWORD fragments, joined onto the last body entry in one go
+        pending: List[str] = []
 
         # Collect simple statements until EndCapsule is encountered.
         # A statement is heuristically started by a KEYWORD and continues until the next KEYWORD
         # or until EndCapsule. This is intentionally simple and tolerant; more precise parsing
         # can be added later.
-        while not self._eof() and not self._match("KEYWORD", "EndCapsule"):
-            t_type, t_val = self._peek()
-            if t_type == "KEYWORD":
-                # start a new statement
-                stmt_parts: List[str] = []
-                # include the starting keyword (e.g. Print, Rule, Isolate)
-                first = self._advance()[1]
-                if first is not None:
-                    stmt_parts.append(first)
-                # consume following non-KEYWORD tokens as part of this statement
-                while not self._eof() and self._peek()[0] != "KEYWORD":
-                    next_tok = self._advance()[1]
-                    if next_tok is not None:
-                        stmt_parts.append(next_tok)
-                stmt = " ".join(part for part in stmt_parts if part is not None).strip()
+        while pos < n:
+            if is_kw[pos]:
+                if value(pos) == "EndCapsule":
+                    # consume EndCapsule
+                    pos += 1
+                    break
+                self._flush_strays(capsule, pending)
+                # start a new statement, including the starting keyword (e.g. Print, Rule, Isolate),
+                # and consume following non-KEYWORD tokens as part of it
+                start = pos
+                pos = _next_keyword(is_kw, pos + 1, n)
+                stmt = self._text(start, pos).strip()
                 if stmt:
                     capsule.add(stmt)
             else:
-                # For non-keyword stray tokens, consume and append as a raw fragment
-                frag = self._advance()[1]
-                if frag is None:
-                    continue
-                if len(capsule.body) == 0:
-                    capsule.add(frag)
-                else:
-                    # append to last entry with a space
-                    last = capsule.body[-1]
-                    if isinstance(last, str):
-                        capsule.body[-1] = last + " " + frag
-                    else:
-                        capsule.add(frag)
-
-        # consume EndCapsule if present
-        if self._match("KEYWORD", "EndCapsule"):
-            self._advance()
+                # For non-keyword stray tokens, consume and buffer as a raw fragment
+                pending.append(value(pos))
+                pos += 1
+        self._flush_strays(capsule, pending)
 
+        self.pos = pos
         return capsule
 
+    @staticmethod
+    def _flush_strays(capsule: Capsule, pending: List[str]) -> None:
+        """Append buffered stray fragments to the last string entry (or as a new one)."""
+        if not pending:
+            return
+        frag = " ".join(pending)
+        if capsule.body and isinstance(capsule.body[-1], str):
+            # append to last entry with a space
+            capsule.body[-1] = capsule.body[-1] + " " + frag
+        else:
+            capsule.add(frag)
+        pending.clear()
+
+
+# Top-level keyword -> block parser, dispatched once per keyword in Parser.parse
+_TOP_LEVEL_PARSERS = {
+    "Main": Parser._parse_main,
+    "Capsule": Parser._parse_capsule,
+}
+
 
 # -------------------------
 # Minimal self-test / example